@@ -1,25 +1,40 @@
 import streamlit as st
 import pandas as pd
-import psycopg
+import numpy as np
 import io
 import zipfile
-from graphviz import Digraph
+from contextlib import contextmanager
+from psycopg_pool import ConnectionPool
 
 # --- 1. DB CONNECTION ---
+def _configure_conn(conn):
+    # Prepare statements on first execution so the server caches the plan.
+    conn.prepare_threshold = 0
+
 @st.cache_resource
-def get_db_connection():
+def get_pool():
     try:
-        return psycopg.connect(st.secrets["DB_URI"], autocommit=True)
+        pool = ConnectionPool(st.secrets["DB_URI"], min_size=1, max_size=4,
+                              open=True, configure=_configure_conn,
+                              kwargs={"autocommit": False})
+        # The pool connects in the background; wait so a bad URI/password
+        # fails fast here instead of as a PoolTimeout on first query
+        pool.wait(timeout=10)
+        return pool
     except Exception as e:
         st.error(f"❌ Connection failed: {e}")
         st.stop()
 
-conn = get_db_connection()
+@contextmanager
+def get_conn():
+    with get_pool().connection() as conn:
+        yield conn
 
 # --- 2. HELPERS ---
 def run_query(query, params=None, fetch=False):
     try:
-        with conn.cursor() as cur:
+        # binary=True: floats/ints come back as 8-byte values, not text
+        with get_conn() as conn, conn.cursor(binary=True) as cur:
             cur.execute(query, params)
             if fetch:
                 return cur.fetchall(), cur.description
@@ -29,86 +44,206 @@ def run_query(query, params=None, fetch=False):
         return False, None
 
 def get_df(query, params=None):
+    # Plain cursor fetch: skips pandas' SQL layer (and its psycopg UserWarning)
     try:
-        return pd.read_sql(query, conn, params=params)
-    except Exception:
+        with get_conn() as conn, conn.cursor(binary=True) as cur:
+            cur.execute(query, params)
+            return pd.DataFrame.from_records(cur.fetchall(),
+                                             columns=[d.name for d in cur.description])
+    except Exception as e:
+        # Reset the (possibly broken) pool and halt this rerun instead of
+        # returning an empty frame the cached loaders would hold for 5 min
         st.cache_resource.clear()
-        return pd.DataFrame()
+        st.error(f"SQL Error: {e}")
+        st.stop()
 
+# Cached read-only loaders: Streamlit reruns the whole script on every
+# widget interaction, so without these each keystroke re-hits the DB.
+@st.cache_data(ttl=300)
+def load_projects():
+    return get_df("SELECT id, name FROM projects ORDER BY id")
+
+@st.cache_data(ttl=300)
+def load_switches(p_id):
+    return get_df("""SELECT id, name, role, ip_address, mac, clock_source, jitter_mode
+                     FROM switches WHERE project_id=%s ORDER BY name""", (p_id,))
+
+@st.cache_data(ttl=300)
+def load_sfps(p_id):
+    return get_df("""SELECT id, serial, wavelength, channel, alpha, delta_tx, delta_rx
+                     FROM sfps WHERE project_id=%s ORDER BY serial""", (p_id,))
+
+@st.cache_data(ttl=300)
+def load_links(p_id):
+    return get_df("""
+        SELECT id, local, port_num, l_sfp, remote, connected_port_num, r_sfp,
+               port_delta_tx, port_delta_rx, total_tx, total_rx, vlan, label
+        FROM links_v WHERE project_id=%s ORDER BY local, port_num
+    """, (p_id,))
+
+@st.cache_data(ttl=300)
+def load_map(p_id):
+    # Nodes and edges in one roundtrip: every switch appears at least once,
+    # rows with a dst carry one outgoing link each.
+    return get_df("""
+        SELECT s1.id AS src, s1.name, s1.role, s1.jitter_mode,
+               s2.id AS dst, p.port_num, p.connected_port_num
+        FROM switches s1
+        LEFT JOIN ports p ON p.switch_id=s1.id AND p.connected_to_id IS NOT NULL
+        LEFT JOIN switches s2 ON s2.id=p.connected_to_id
+        WHERE s1.project_id=%s ORDER BY s1.name
+    """, (p_id,))
+
+def clear_project_caches():
+    load_projects.clear()
+    load_switches.clear()
+    load_sfps.clear()
+    load_links.clear()
+    load_map.clear()
+
+# One multi-statement string so the whole bootstrap is a single roundtrip;
+# cache_resource makes it fire once per server process instead of per rerun.
+INIT_DDL = """
+    CREATE TABLE IF NOT EXISTS projects (
+        id SERIAL PRIMARY KEY, name TEXT UNIQUE
+    );
+    CREATE TABLE IF NOT EXISTS switches (
+        id SERIAL PRIMARY KEY, project_id INTEGER REFERENCES projects(id) ON DELETE CASCADE,
+        name TEXT, role TEXT, ip_address TEXT, mac TEXT, clock_source TEXT,
+        jitter_mode TEXT DEFAULT 'Normal',
+        UNIQUE(project_id, name)
+    );
+    CREATE TABLE IF NOT EXISTS sfps (
+        id SERIAL PRIMARY KEY, project_id INTEGER REFERENCES projects(id) ON DELETE CASCADE,
+        serial TEXT, wavelength TEXT, channel TEXT, alpha FLOAT DEFAULT 0,
+        delta_tx FLOAT DEFAULT 0, delta_rx FLOAT DEFAULT 0,
+        UNIQUE(project_id, serial)
+    );
+    CREATE TABLE IF NOT EXISTS ports (
+        id SERIAL PRIMARY KEY, project_id INTEGER REFERENCES projects(id) ON DELETE CASCADE,
+        switch_id INTEGER REFERENCES switches(id) ON DELETE CASCADE,
+        port_num INTEGER, sfp_id INTEGER REFERENCES sfps(id) ON DELETE SET NULL,
+        remote_sfp_id INTEGER REFERENCES sfps(id) ON DELETE SET NULL,
+        connected_to_id INTEGER REFERENCES switches(id) ON DELETE SET NULL,
+        connected_port_num INTEGER, port_delta_tx FLOAT DEFAULT 0,
+        port_delta_rx FLOAT DEFAULT 0, vlan INTEGER
+    );
+    -- MIGRATION: Ensure jitter_mode exists in old DBs
+    ALTER TABLE switches ADD COLUMN IF NOT EXISTS jitter_mode TEXT DEFAULT 'Normal';
+    -- Hot filter/join paths: without these every tab render seq-scans ports
+    CREATE INDEX IF NOT EXISTS idx_ports_proj_sw ON ports(project_id, switch_id);
+    CREATE INDEX IF NOT EXISTS idx_ports_proj_conn ON ports(project_id, connected_to_id);
+    CREATE INDEX IF NOT EXISTS idx_ports_sfp ON ports(sfp_id);
+    CREATE INDEX IF NOT EXISTS idx_ports_remote_sfp ON ports(remote_sfp_id);
+    CREATE INDEX IF NOT EXISTS idx_sw_proj ON switches(project_id);
+    CREATE INDEX IF NOT EXISTS idx_sfp_proj ON sfps(project_id);
+    -- MIGRATION: legacy Create Link inserted a fresh row per submit; keep the
+    -- newest duplicate (last-write-wins, same as the upsert) so the unique
+    -- index below can build on existing databases
+    DELETE FROM ports a USING ports b
+        WHERE a.switch_id=b.switch_id AND a.port_num=b.port_num AND a.id<b.id;
+    -- One row per physical port: re-saving a link updates instead of duplicating
+    CREATE UNIQUE INDEX IF NOT EXISTS uq_ports_sw_port ON ports(switch_id, port_num);
+    -- Canonical link view: join + calibrated totals live server-side
+    CREATE OR REPLACE VIEW links_v AS
+        SELECT p.project_id, p.id, s1.name AS local, p.port_num, sfp1.serial AS l_sfp,
+               s2.name AS remote, p.connected_port_num, sfp2.serial AS r_sfp,
+               p.port_delta_tx, p.port_delta_rx,
+               COALESCE(sfp1.delta_tx, 0) + p.port_delta_tx AS total_tx,
+               COALESCE(sfp1.delta_rx, 0) + p.port_delta_rx AS total_rx,
+               p.vlan,
+               'ID ' || p.id || ': ' || s1.name || ' P' || p.port_num || ' -> '
+                   || COALESCE(s2.name, 'None') AS label
+        FROM ports p
+        JOIN switches s1 ON p.switch_id=s1.id
+        LEFT JOIN switches s2 ON p.connected_to_id=s2.id
+        LEFT JOIN sfps sfp1 ON p.sfp_id=sfp1.id
+        LEFT JOIN sfps sfp2 ON p.remote_sfp_id=sfp2.id;
+    -- Fresh planner stats so the new indexes actually get picked
+    ANALYZE projects;
+    ANALYZE switches;
+    ANALYZE sfps;
+    ANALYZE ports;
+"""
+
+# Arbitrary app-wide key for the bootstrap advisory lock
+_INIT_LOCK_KEY = 4242
+
+@st.cache_resource
 def init_db():
-    with conn.cursor() as cur:
-        # Projects
-        cur.execute("""CREATE TABLE IF NOT EXISTS projects (
-            id SERIAL PRIMARY KEY, name TEXT UNIQUE
-        )""")
-        
-        # Switches (Added jitter_mode)
-        cur.execute("""CREATE TABLE IF NOT EXISTS switches (
-            id SERIAL PRIMARY KEY, project_id INTEGER REFERENCES projects(id) ON DELETE CASCADE, 
-            name TEXT, role TEXT, ip_address TEXT, mac TEXT, clock_source TEXT,
-            jitter_mode TEXT DEFAULT 'Normal',
-            UNIQUE(project_id, name)
-        )""")
-        
-        # SFPs
-        cur.execute("""CREATE TABLE IF NOT EXISTS sfps (
-            id SERIAL PRIMARY KEY, project_id INTEGER REFERENCES projects(id) ON DELETE CASCADE,
-            serial TEXT, wavelength TEXT, channel TEXT, alpha FLOAT DEFAULT 0, 
-            delta_tx FLOAT DEFAULT 0, delta_rx FLOAT DEFAULT 0,
-            UNIQUE(project_id, serial)
-        )""")
-        
-        # Ports
-        cur.execute("""CREATE TABLE IF NOT EXISTS ports (
-            id SERIAL PRIMARY KEY, project_id INTEGER REFERENCES projects(id) ON DELETE CASCADE,
-            switch_id INTEGER REFERENCES switches(id) ON DELETE CASCADE, 
-            port_num INTEGER, sfp_id INTEGER REFERENCES sfps(id) ON DELETE SET NULL,
-            remote_sfp_id INTEGER REFERENCES sfps(id) ON DELETE SET NULL,
-            connected_to_id INTEGER REFERENCES switches(id) ON DELETE SET NULL, 
-            connected_port_num INTEGER, port_delta_tx FLOAT DEFAULT 0, 
-            port_delta_rx FLOAT DEFAULT 0, vlan INTEGER
-        )""")
-
-        # MIGRATION: Ensure jitter_mode exists in old DBs
-        cur.execute("ALTER TABLE switches ADD COLUMN IF NOT EXISTS jitter_mode TEXT DEFAULT 'Normal'")
+    with get_conn() as conn, conn.cursor() as cur:
+        # Serialize concurrent workers on a transaction-scoped advisory lock
+        # so only one runs the DDL; the others wait here and then hit pure
+        # IF NOT EXISTS no-ops. xact-scoped: released on commit or rollback,
+        # so a failed DDL statement cannot leak the lock back into the pool.
+        cur.execute("SELECT pg_advisory_xact_lock(%s)", (_INIT_LOCK_KEY,))
+        # Multi-statement strings cannot be server-prepared
+        cur.execute(INIT_DDL, prepare=False)
+    return True
+
+# Folded once: 1000 m/km * group index / c * 1e9 ns
+NS_PER_KM = 1000 * 1.4682 / 299792458 * 1e9
+
+def fiber_delay_ns(length_km):
+    # Works on scalars and numpy arrays alike, so batch sweeps stay vectorized
+    return length_km * NS_PER_KM
+
+LINK_UPSERT = """INSERT INTO ports (project_id, switch_id, port_num, sfp_id, remote_sfp_id,
+                 connected_to_id, connected_port_num, port_delta_tx, port_delta_rx, vlan)
+                 VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                 ON CONFLICT (switch_id, port_num) DO UPDATE SET
+                     sfp_id=EXCLUDED.sfp_id, remote_sfp_id=EXCLUDED.remote_sfp_id,
+                     connected_to_id=EXCLUDED.connected_to_id, connected_port_num=EXCLUDED.connected_port_num,
+                     port_delta_tx=EXCLUDED.port_delta_tx, port_delta_rx=EXCLUDED.port_delta_rx,
+                     vlan=EXCLUDED.vlan"""
+
+def save_links(rows):
+    # One code path for the single-link form and bulk CSV import.
+    # psycopg3 pipelines executemany, so N upserts cost one network flush
+    # (and unlike COPY, re-imports update existing ports instead of failing).
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.executemany(LINK_UPSERT, rows)
 
 # --- 3. DUPLICATE LOGIC ---
+# One statement, one roundtrip: the data-modifying CTEs insert the new
+# project, switches and SFPs, and their RETURNING rows drive the port
+# insert. Old->new id translation rides on the per-project unique keys
+# (switches.name, sfps.serial) instead of Python-side id maps.
+CLONE_SQL = """
+    WITH np AS (
+        INSERT INTO projects (name) VALUES (%(name)s) RETURNING id
+    ), nsw AS (
+        INSERT INTO switches (project_id, name, role, ip_address, mac, clock_source, jitter_mode)
+        SELECT np.id, s.name, s.role, s.ip_address, s.mac, s.clock_source, s.jitter_mode
+        FROM switches s, np WHERE s.project_id=%(old)s
+        RETURNING id, name
+    ), nsfp AS (
+        INSERT INTO sfps (project_id, serial, wavelength, channel, alpha, delta_tx, delta_rx)
+        SELECT np.id, f.serial, f.wavelength, f.channel, f.alpha, f.delta_tx, f.delta_rx
+        FROM sfps f, np WHERE f.project_id=%(old)s
+        RETURNING id, serial
+    )
+    INSERT INTO ports (project_id, switch_id, port_num, sfp_id, remote_sfp_id,
+                       connected_to_id, connected_port_num, port_delta_tx, port_delta_rx, vlan)
+    SELECT np.id, ns.id, p.port_num, lf.id, rf.id, ncs.id,
+           p.connected_port_num, p.port_delta_tx, p.port_delta_rx, p.vlan
+    FROM ports p
+    JOIN switches os ON os.id = p.switch_id
+    JOIN nsw ns ON ns.name = os.name
+    LEFT JOIN sfps osfp ON osfp.id = p.sfp_id
+    LEFT JOIN nsfp lf ON lf.serial = osfp.serial
+    LEFT JOIN sfps orsfp ON orsfp.id = p.remote_sfp_id
+    LEFT JOIN nsfp rf ON rf.serial = orsfp.serial
+    LEFT JOIN switches ocs ON ocs.id = p.connected_to_id
+    LEFT JOIN nsw ncs ON ncs.name = ocs.name
+    CROSS JOIN np
+    WHERE p.project_id=%(old)s
+"""
+
 def duplicate_network(old_pid, new_name):
     try:
-        with conn.cursor() as cur:
-            # Copy Project
-            cur.execute("INSERT INTO projects (name) VALUES (%s) RETURNING id", (new_name,))
-            new_pid = cur.fetchone()[0]
-            
-            # Copy Switches
-            cur.execute("SELECT id, name, role, ip_address, mac, clock_source, jitter_mode FROM switches WHERE project_id=%s", (old_pid,))
-            switches = cur.fetchall()
-            sw_map = {} 
-            for s in switches:
-                cur.execute("INSERT INTO switches (project_id, name, role, ip_address, mac, clock_source, jitter_mode) VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING id", 
-                               (new_pid, s[1], s[2], s[3], s[4], s[5], s[6]))
-                sw_map[s[0]] = cur.fetchone()[0]
-
-            # Copy SFPs
-            cur.execute("SELECT id, serial, wavelength, channel, alpha, delta_tx, delta_rx FROM sfps WHERE project_id=%s", (old_pid,))
-            sfps = cur.fetchall()
-            sfp_map = {}
-            for s in sfps:
-                cur.execute("INSERT INTO sfps (project_id, serial, wavelength, channel, alpha, delta_tx, delta_rx) VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING id", 
-                               (new_pid, s[1], s[2], s[3], s[4], s[5], s[6]))
-                sfp_map[s[0]] = cur.fetchone()[0]
-
-            # Copy Ports
-            cur.execute("SELECT switch_id, port_num, sfp_id, remote_sfp_id, connected_to_id, connected_port_num, port_delta_tx, port_delta_rx, vlan FROM ports WHERE project_id=%s", (old_pid,))
-            ports = cur.fetchall()
-            for p in ports:
-                sid = sw_map.get(p[0])
-                cid = sw_map.get(p[4])
-                sfpid = sfp_map.get(p[2])
-                rsfpid = sfp_map.get(p[3])
-                if sid:
-                    cur.execute("INSERT INTO ports (project_id, switch_id, port_num, sfp_id, remote_sfp_id, connected_to_id, connected_port_num, port_delta_tx, port_delta_rx, vlan) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)", 
-                                   (new_pid, sid, p[1], sfpid, rsfpid, cid, p[5], p[6], p[7], p[8]))
+        with get_conn() as conn, conn.cursor() as cur:
+            cur.execute(CLONE_SQL, {"name": new_name, "old": old_pid})
         return True
     except Exception as e:
         st.error(f"Clone Failed: {e}")
@@ -122,13 +257,14 @@ init_db()
 st.sidebar.title("🎛️ Network Manager")
 
 # 1. Project Selector
-projects = get_df("SELECT * FROM projects ORDER BY id")
+projects = load_projects()
 pid = None
 selected_project = None
 
 if not projects.empty:
+    proj_name_id = dict(zip(projects['name'], projects['id'].astype(int)))
     selected_project = st.sidebar.selectbox("Active Network", projects['name'])
-    pid = int(projects[projects['name'] == selected_project]['id'].values[0])
+    pid = proj_name_id[selected_project]
 else:
     st.sidebar.warning("No networks found.")
 
@@ -138,6 +274,7 @@ with st.sidebar.expander("➕ Create New Network", expanded=projects.empty):
     if st.button("Create"):
         if new_p_name:
             if run_query("INSERT INTO projects (name) VALUES (%s)", (new_p_name,))[0]:
+                load_projects.clear()
                 st.rerun()
             else:
                 st.error("Name taken.")
@@ -152,6 +289,7 @@ with st.sidebar.expander("⚡ Duplicate Network"):
     clone_name = st.text_input("New Name")
     if st.button("Duplicate Now"):
         if duplicate_network(pid, clone_name):
+            clear_project_caches()
             st.success("Done!")
             st.rerun()
 
@@ -159,17 +297,17 @@ with st.sidebar.expander("⚡ Duplicate Network"):
 st.sidebar.subheader("Danger Zone")
 if st.sidebar.button("🗑️ DELETE CURRENT NETWORK", type="primary"):
     run_query("DELETE FROM projects WHERE id=%s", (pid,))
+    clear_project_caches()
     st.rerun()
 
 # --- MAIN TABS ---
-st.title(f"🐇 {selected_project}")
-tabs = st.tabs(["🗺️ Map", "🖥️ Switches", "🔌 SFPs", "⚙️ Connections", "💾 Backup", "📐 Calc"])
-
-# --- TAB 1: SWITCHES ---
-with tabs[1]:
+# Each tab body is an st.fragment: widget events inside a tab rerun only
+# that tab instead of the whole script (and all its DB reads).
+@st.fragment
+def render_switches_tab(p_id):
     st.subheader("Switches")
-    sw_df = get_df("SELECT * FROM switches WHERE project_id=%s ORDER BY name", (pid,))
-    st.dataframe(sw_df.drop(columns=['project_id']), use_container_width=True)
+    sw_df = load_switches(p_id)
+    st.dataframe(sw_df, use_container_width=True)
 
     # Add/Edit Form
     with st.form("sw_form"):
@@ -178,7 +316,7 @@ with tabs[1]:
         s_name = c1.text_input("Name (Unique)", placeholder="WRS-1")
         s_ip = c2.text_input("IP Address")
         s_mac = c3.text_input("MAC Address")
-        
+
         c4, c5, c6 = st.columns(3)
         s_role = c4.selectbox("Role", ["Grandmaster", "Boundary", "Slave"])
         s_clk = c5.text_input("Clock Source")
@@ -187,31 +325,34 @@ with tabs[1]:
 
         if st.form_submit_button("Save Switch"):
             if s_name:
-                exists = not sw_df[sw_df['name'] == s_name].empty
-                if exists:
-                    run_query("UPDATE switches SET ip_address=%s, mac=%s, role=%s, clock_source=%s, jitter_mode=%s WHERE project_id=%s AND name=%s", 
-                                (s_ip, s_mac, s_role, s_clk, s_jitter, pid, s_name))
-                    st.success("Updated!")
-                else:
-                    if run_query("INSERT INTO switches (project_id, name, ip_address, mac, role, clock_source, jitter_mode) VALUES (%s, %s, %s, %s, %s, %s, %s)", 
-                                (pid, s_name, s_ip, s_mac, s_role, s_clk, s_jitter))[0]:
-                        st.success("Created!")
-                    else:
-                        st.error("Name duplicate.")
+                # Atomic upsert on the existing UNIQUE(project_id, name)
+                if run_query("""INSERT INTO switches (project_id, name, ip_address, mac, role, clock_source, jitter_mode)
+                                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                                ON CONFLICT (project_id, name) DO UPDATE SET
+                                    ip_address=EXCLUDED.ip_address, mac=EXCLUDED.mac, role=EXCLUDED.role,
+                                    clock_source=EXCLUDED.clock_source, jitter_mode=EXCLUDED.jitter_mode""",
+                             (p_id, s_name, s_ip, s_mac, s_role, s_clk, s_jitter))[0]:
+                    st.success("Saved!")
+                load_switches.clear()
+                load_links.clear()
+                load_map.clear()
                 st.rerun()
 
     if not sw_df.empty:
         with st.expander("Delete Switch"):
             del_s = st.selectbox("Select", sw_df['name'])
             if st.button("Delete Switch"):
-                run_query("DELETE FROM switches WHERE project_id=%s AND name=%s", (pid, del_s))
+                run_query("DELETE FROM switches WHERE project_id=%s AND name=%s", (p_id, del_s))
+                load_switches.clear()
+                load_links.clear()
+                load_map.clear()
                 st.rerun()
 
-# --- TAB 2: SFPs ---
-with tabs[2]:
+@st.fragment
+def render_sfps_tab(p_id):
     st.subheader("SFPs")
-    sfp_df = get_df("SELECT * FROM sfps WHERE project_id=%s ORDER BY serial", (pid,))
-    st.dataframe(sfp_df.drop(columns=['project_id']), use_container_width=True)
+    sfp_df = load_sfps(p_id)
+    st.dataframe(sfp_df, use_container_width=True)
 
     with st.form("sfp_form"):
         st.write("### Add / Edit SFP")
@@ -226,43 +367,41 @@ with tabs[2]:
 
         if st.form_submit_button("Save SFP"):
             if sn:
-                exists = not sfp_df[sfp_df['serial'] == sn].empty
-                if exists:
-                    run_query("UPDATE sfps SET channel=%s, wavelength=%s, alpha=%s, delta_tx=%s, delta_rx=%s WHERE project_id=%s AND serial=%s",
-                              (ch, wv, al, dtx, drx, pid, sn))
-                    st.success("Updated")
-                else:
-                    run_query("INSERT INTO sfps (project_id, serial, channel, wavelength, alpha, delta_tx, delta_rx) VALUES (%s, %s, %s, %s, %s, %s, %s)",
-                              (pid, sn, ch, wv, al, dtx, drx))
-                    st.success("Created")
+                # Atomic upsert on the existing UNIQUE(project_id, serial)
+                if run_query("""INSERT INTO sfps (project_id, serial, channel, wavelength, alpha, delta_tx, delta_rx)
+                                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                                ON CONFLICT (project_id, serial) DO UPDATE SET
+                                    channel=EXCLUDED.channel, wavelength=EXCLUDED.wavelength, alpha=EXCLUDED.alpha,
+                                    delta_tx=EXCLUDED.delta_tx, delta_rx=EXCLUDED.delta_rx""",
+                             (p_id, sn, ch, wv, al, dtx, drx))[0]:
+                    st.success("Saved")
+                load_sfps.clear()
+                load_links.clear()
                 st.rerun()
-    
+
     if not sfp_df.empty:
         with st.expander("Delete SFP"):
             del_s = st.selectbox("Select SFP", sfp_df['serial'])
             if st.button("Delete SFP"):
-                run_query("DELETE FROM sfps WHERE project_id=%s AND serial=%s", (pid, del_s))
+                run_query("DELETE FROM sfps WHERE project_id=%s AND serial=%s", (p_id, del_s))
+                load_sfps.clear()
+                load_links.clear()
                 st.rerun()
 
-# --- TAB 3: CONNECTIONS ---
-with tabs[3]:
+@st.fragment
+def render_connections_tab(p_id):
     st.subheader("Connections")
-    conn_df = get_df(f"""
-        SELECT p.id, s1.name as local, p.port_num, sfp1.serial as l_sfp,
-               s2.name as remote, p.connected_port_num, sfp2.serial as r_sfp,
-               p.port_delta_tx, p.port_delta_rx, p.vlan
-        FROM ports p 
-        JOIN switches s1 ON p.switch_id=s1.id 
-        LEFT JOIN switches s2 ON p.connected_to_id=s2.id 
-        LEFT JOIN sfps sfp1 ON p.sfp_id=sfp1.id
-        LEFT JOIN sfps sfp2 ON p.remote_sfp_id=sfp2.id
-        WHERE p.project_id=%s ORDER BY s1.name, p.port_num
-    """, (pid,))
-    st.dataframe(conn_df, use_container_width=True)
+    sw_df = load_switches(p_id)
+    sfp_df = load_sfps(p_id)
+    conn_df = load_links(p_id)
+    st.dataframe(conn_df.drop(columns=['label']), use_container_width=True)
 
     mode = st.radio("Action", ["Add Link", "Edit Link"], horizontal=True)
     sw_opts = sw_df['name'].tolist() if not sw_df.empty else []
     sfp_opts = ["None"] + sfp_df['serial'].tolist() if not sfp_df.empty else ["None"]
+    # O(1) lookups on submit instead of a boolean scan per name
+    sw_name_id = dict(zip(sw_df['name'], sw_df['id'].astype(int))) if not sw_df.empty else {}
+    sfp_sn_id = dict(zip(sfp_df['serial'], sfp_df['id'].astype(int))) if not sfp_df.empty else {}
 
     if mode == "Add Link":
         with st.form("lnk_form"):
@@ -270,7 +409,7 @@ with tabs[3]:
             l_sw = c1.selectbox("Local Switch", sw_opts)
             l_p = c1.number_input("Local Port", 1, 52)
             l_sfp = c1.selectbox("Local SFP", sfp_opts)
-            
+
             c4, c5, c6 = st.columns(3)
             p_dtx = c4.number_input("Delta Tx", 0.0)
             p_drx = c5.number_input("Delta Rx", 0.0)
@@ -283,53 +422,137 @@ with tabs[3]:
 
             if st.form_submit_button("Create Link"):
                 if l_sw:
-                    lid = int(sw_df[sw_df['name']==l_sw]['id'].values[0])
-                    rid = int(sw_df[sw_df['name']==r_sw]['id'].values[0]) if r_sw != "None" else None
-                    sid1 = int(sfp_df[sfp_df['serial']==l_sfp]['id'].values[0]) if l_sfp != "None" else None
-                    sid2 = int(sfp_df[sfp_df['serial']==r_sfp]['id'].values[0]) if r_sfp != "None" else None
-                    
-                    run_query("INSERT INTO ports (project_id, switch_id, port_num, sfp_id, remote_sfp_id, connected_to_id, connected_port_num, port_delta_tx, port_delta_rx, vlan) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
-                              (pid, lid, l_p, sid1, sid2, rid, r_p, p_dtx, p_drx, vlan if vlan > 0 else None))
-                    st.success("Link Created")
-                    st.rerun()
+                    lid = sw_name_id[l_sw]
+                    rid = sw_name_id.get(r_sw)
+                    sid1 = sfp_sn_id.get(l_sfp)
+                    sid2 = sfp_sn_id.get(r_sfp)
+
+                    try:
+                        save_links([(p_id, lid, l_p, sid1, sid2, rid, r_p, p_dtx, p_drx, vlan if vlan > 0 else None)])
+                        load_links.clear()
+                        load_map.clear()
+                        st.success("Link Created")
+                        st.rerun()
+                    except Exception as e:
+                        st.error(f"SQL Error: {e}")
+
+        with st.expander("📥 Bulk Import Links (CSV: local,port,remote,remote_port)"):
+            up = st.file_uploader("CSV File", type="csv")
+            if up is not None and st.button("Import Links"):
+                try:
+                    imp = pd.read_csv(up)
+                    rows = []
+                    for r in imp.itertuples(index=False):
+                        lid = sw_name_id.get(r.local)
+                        if lid:
+                            rows.append((p_id, lid, int(r.port), None, None,
+                                         sw_name_id.get(r.remote),
+                                         int(r.remote_port) if pd.notna(r.remote_port) else None,
+                                         0, 0, None))
+                    if rows:
+                        save_links(rows)
+                        load_links.clear()
+                        load_map.clear()
+                        st.success(f"Imported {len(rows)} links")
+                        st.rerun()
+                except Exception as e:
+                    st.error(f"Import Failed: {e}")
 
     elif mode == "Edit Link" and not conn_df.empty:
-        sel_lbl = st.selectbox("Select Link", conn_df.apply(lambda x: f"ID {x['id']}: {x['local']} P{x['port_num']} -> {x['remote']}", axis=1))
-        sel_id = int(sel_lbl.split(":")[0].replace("ID ", ""))
+        # Labels come pre-built from links_v: no client-side concat
+        labels = conn_df['label']
+        id_by_label = dict(zip(labels, conn_df['id'].astype(int)))
+        sel_lbl = st.selectbox("Select Link", labels)
+        sel_id = id_by_label[sel_lbl]
         with st.form("edit_lnk"):
             ndtx = st.number_input("Update Delta Tx", 0.0)
             ndrx = st.number_input("Update Delta Rx", 0.0)
             if st.form_submit_button("Update"):
                 run_query("UPDATE ports SET port_delta_tx=%s, port_delta_rx=%s WHERE id=%s", (ndtx, ndrx, sel_id))
+                load_links.clear()
                 st.rerun()
         if st.button("Delete Link"):
             run_query("DELETE FROM ports WHERE id=%s", (sel_id,))
+            load_links.clear()
+            load_map.clear()
             st.rerun()
 
-# --- TAB 0: MAP ---
-with tabs[0]:
-    if not sw_df.empty:
-        dot = Digraph(format='pdf')
-        dot.attr(rankdir='LR')
-        for _, s in sw_df.iterrows():
-            dot.node(str(s['id']), f"{s['name']}\n{s['role']}\n{s.get('jitter_mode', 'Normal')}")
-        links = get_df("SELECT switch_id, connected_to_id, port_num, connected_port_num FROM ports WHERE project_id=%s AND connected_to_id IS NOT NULL", (pid,))
-        for _, l in links.iterrows():
-            dot.edge(str(l['switch_id']), str(l['connected_to_id']), label=f"P{l['port_num']}:P{l['connected_port_num']}")
-        st.graphviz_chart(dot)
-
-# --- TAB 4: BACKUP ---
-with tabs[4]:
+def _dot_escape(s):
+    # Names/roles are free text; \ and " would break the quoted DOT string
+    return str(s).replace("\\", "\\\\").replace('"', '\\"')
+
+@st.cache_data
+def build_topology_dot(map_rows):
+    # Keyed on the plain row tuples: unchanged topology = cache hit,
+    # so the graph is not rebuilt while the user edits other tabs.
+    # DOT source is emitted directly: one list-join instead of a
+    # Digraph method call (attr dict formatting + escaping) per row.
+    lines = ["digraph {", "rankdir=LR"]
+    seen = set()
+    for src, name, role, jitter_mode, dst, port_num, connected_port_num in map_rows:
+        if src not in seen:
+            seen.add(src)
+            label = f'{_dot_escape(name)}\\n{_dot_escape(role)}\\n{_dot_escape(jitter_mode or "Normal")}'
+            lines.append(f'"{src}" [label="{label}"]')
+        if pd.notna(dst):
+            lines.append(f'"{src}" -> "{int(dst)}" [label="P{int(port_num)}:P{int(connected_port_num)}"]')
+    lines.append("}")
+    return "\n".join(lines)
+
+@st.fragment
+def render_map_tab(p_id):
+    map_df = load_map(p_id)
+    if not map_df.empty:
+        map_rows = tuple(map_df.itertuples(index=False, name=None))
+        st.graphviz_chart(build_topology_dot(map_rows))
+
+@st.fragment
+def render_backup_tab(p_id):
     if st.button("📦 Backup ZIP"):
+        backup_queries = (
+            ("switches", "SELECT * FROM switches WHERE project_id=%s ORDER BY name"),
+            ("sfps", "SELECT * FROM sfps WHERE project_id=%s ORDER BY serial"),
+            ("links", "SELECT * FROM links_v WHERE project_id=%s ORDER BY local, port_num"),
+        )
         buf = io.BytesIO()
-        with zipfile.ZipFile(buf, "w") as zf:
-            zf.writestr("switches.json", sw_df.to_json(orient='records'))
-            zf.writestr("sfps.json", sfp_df.to_json(orient='records'))
-            zf.writestr("links.json", conn_df.to_json(orient='records'))
+        with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=3) as zf, \
+             get_conn() as conn, conn.cursor() as cur:
+            for name, query in backup_queries:
+                # Postgres formats the CSV and streams it straight into the
+                # archive member -- no DataFrame or big string in between
+                with zf.open(f"{name}.csv", "w") as fh:
+                    with cur.copy(f"COPY ({query}) TO STDOUT WITH (FORMAT CSV, HEADER)", (p_id,)) as cp:
+                        for block in cp:
+                            fh.write(block)
         st.download_button("Download", buf.getvalue(), "backup.zip", "application/zip")
 
-# --- TAB 5: CALC ---
-with tabs[5]:
+@st.fragment
+def render_calc_tab():
     st.subheader("Fiber Calc")
     km = st.number_input("Km", 0.0)
-    st.metric("Delay", f"{(km * 1000 * 1.4682 / 299792458 * 1e9):.2f} ns")
+    st.metric("Delay", f"{fiber_delay_ns(km):.2f} ns")
+    sweep = st.text_input("Batch (comma-separated km)", placeholder="1, 2.5, 10")
+    if sweep:
+        try:
+            # Explicit parse: np.fromstring silently truncates at bad tokens
+            kms = np.array([float(x) for x in sweep.split(",")])
+            st.dataframe(pd.DataFrame({"km": kms, "delay_ns": fiber_delay_ns(kms)}),
+                         use_container_width=True)
+        except ValueError:
+            st.error("Numbers only.")
+
+st.title(f"🐇 {selected_project}")
+tabs = st.tabs(["🗺️ Map", "🖥️ Switches", "🔌 SFPs", "⚙️ Connections", "💾 Backup", "📐 Calc"])
+
+with tabs[0]:
+    render_map_tab(pid)
+with tabs[1]:
+    render_switches_tab(pid)
+with tabs[2]:
+    render_sfps_tab(pid)
+with tabs[3]:
+    render_connections_tab(pid)
+with tabs[4]:
+    render_backup_tab(pid)
+with tabs[5]:
+    render_calc_tab()